@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import io
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SERIES_COLUMNS = {"date", "f51", "close", "f53", "high", "f54", "code", "name"}
+MIN_ROW_BYTES = 8
+TAIL_SLACK = 8
+TAIL_LINE_BYTES = 256
+
+
+def has_min_rows(path: str, rows: int) -> bool:
+    try:
+        return os.path.getsize(path) >= rows * MIN_ROW_BYTES
+    except OSError:
+        return False
+
+
+def parse_date_int(value: str) -> Optional[int]:
+    if len(value) == 10 and value[4] == "-" and value[7] == "-":
+        digits = value[:4] + value[5:7] + value[8:]
+        if digits.isdigit():
+            return int(digits)
+    if len(value) == 8 and value.isdigit():
+        return int(value)
+    cleaned = value.strip().replace("-", "").replace("/", "")
+    if len(cleaned) != 8 or not cleaned.isdigit():
+        return None
+    return int(cleaned)
+
+
+def parse_date_int_array(values: np.ndarray) -> np.ndarray:
+    cleaned = np.char.replace(
+        np.char.replace(np.char.strip(values.astype(str)), "-", ""), "/", ""
+    )
+    parsed = np.full(cleaned.shape, -1, dtype=np.int64)
+    valid = np.char.isdigit(cleaned) & (np.char.str_len(cleaned) == 8)
+    if valid.any():
+        parsed[valid] = cleaned[valid].astype(np.int64)
+    return parsed
+
+
+def read_tail_csv(path: str, rows: int) -> Optional[io.BytesIO]:
+    keep = rows + TAIL_SLACK
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as handle:
+            header = handle.readline()
+            start = size - keep * TAIL_LINE_BYTES
+            truncated = start > len(header)
+            if truncated:
+                handle.seek(start)
+                handle.readline()
+            body = handle.read()
+    except OSError:
+        return None
+    lines = body.splitlines()[-keep:]
+    if not lines:
+        return None
+    if truncated and len(lines) < rows:
+        return None
+    return io.BytesIO(header + b"\n".join(lines) + b"\n")
+
+
+def parse_series_csv(
+    source,
+) -> Optional[Tuple[str, str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    try:
+        df = pd.read_csv(
+            source,
+            usecols=lambda column: column in SERIES_COLUMNS,
+            dtype=str,
+            engine="c",
+        )
+    except (OSError, ValueError):
+        return None
+    fields = df.columns
+    date_field = "date" if "date" in fields else "f51" if "f51" in fields else None
+    close_field = "close" if "close" in fields else "f53" if "f53" in fields else None
+    high_field = "high" if "high" in fields else "f54" if "f54" in fields else None
+    if not date_field:
+        return None
+
+    date_raw = df[date_field].fillna("").str.strip()
+    cleaned = date_raw.str.replace("-", "", regex=False).str.replace(
+        "/", "", regex=False
+    )
+    date_int = pd.to_numeric(
+        cleaned.where(cleaned.str.fullmatch(r"\d{8}")), errors="coerce"
+    )
+    mask = date_int.notna()
+    if not mask.any():
+        return None
+
+    first = mask.idxmax()
+    code = str(df["code"].fillna("")[first]).strip() if "code" in fields else ""
+    name = str(df["name"].fillna("")[first]).strip() if "name" in fields else ""
+
+    date_ints = date_int[mask].astype("int64").to_numpy()
+    sorted_already = bool((np.diff(date_ints) >= 0).all())
+    if not sorted_already:
+        order = np.argsort(date_ints, kind="stable")
+        date_ints = date_ints[order]
+    dates = date_raw[mask].to_numpy()
+    if close_field:
+        closes = pd.to_numeric(df[close_field], errors="coerce")[mask].to_numpy(
+            dtype=np.float32
+        )
+    else:
+        closes = np.full(date_ints.size, np.nan, dtype=np.float32)
+    if high_field:
+        highs = pd.to_numeric(df[high_field], errors="coerce")[mask].to_numpy(
+            dtype=np.float32
+        )
+    else:
+        highs = np.full(date_ints.size, np.nan, dtype=np.float32)
+    if not sorted_already:
+        dates = dates[order]
+        closes = closes[order]
+        highs = highs[order]
+    return code, name, date_ints, dates, closes, highs
+
+
+def _tail_slice(
+    columns: Tuple[str, str, np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+    tail: Optional[int],
+) -> Tuple[str, str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    if tail is None:
+        return columns
+    keep = tail + TAIL_SLACK
+    code, name, date_ints, dates, closes, highs = columns
+    if date_ints.size <= keep:
+        return columns
+    return (
+        code,
+        name,
+        date_ints[-keep:],
+        dates[-keep:],
+        closes[-keep:],
+        highs[-keep:],
+    )
+
+
+def load_series_arrays(
+    path: str, tail: Optional[int] = None
+) -> Optional[Tuple[str, str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    if tail is not None:
+        buffer = read_tail_csv(path, tail)
+        if buffer is not None:
+            parsed = parse_series_csv(buffer)
+            if parsed is not None:
+                return _tail_slice(parsed, tail)
+    parsed = parse_series_csv(path)
+    if parsed is None:
+        return None
+    return _tail_slice(parsed, tail)
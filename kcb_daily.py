@@ -1,14 +1,57 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import csv
 import datetime
+import email.utils
+import functools
+import gzip
+import hashlib
+import json
 import math
 import os
+import random
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+from kcb_common import parse_date_int, parse_date_int_array
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+ASYNC_ERRORS: Tuple[type, ...] = (asyncio.TimeoutError,)
+if aiohttp is not None:
+    ASYNC_ERRORS += (aiohttp.ClientError,)
+if httpx is not None:
+    ASYNC_ERRORS += (httpx.HTTPError,)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 LIST_URL = "https://push2.eastmoney.com/api/qt/clist/get"
 KLINE_URL = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
@@ -39,6 +82,8 @@ FIELDS2_NAME_MAP = {
     "f61": "turnover",
 }
 
+BASE_META_KEYS = ("code", "name", "market", "secid")
+
 DEFAULT_KLT = 101
 DEFAULT_FQT = 1
 DEFAULT_BEG = 20100101
@@ -48,10 +93,115 @@ DEFAULT_SLEEP = 0.25
 DEFAULT_TIMEOUT = 10
 DEFAULT_RETRIES = 3
 DEFAULT_BACKOFF = 0.6
+DEFAULT_CONCURRENCY = 8
 DEFAULT_UT = "fa5fd1943c7b386f172d6893dbfba10b"
 
 LIST_FIELDS = "f12,f14,f13"
 LIST_FS = "m:1+t:23"
+LIST_WORKERS = 8
+
+
+POOL_SIZE = 32
+WRITE_BUFFER = 64 * 1024
+DEFAULT_CACHE_TTL = 6 * 3600.0
+DEFAULT_JITTER = 0.1
+EWMA_ALPHA = 0.2
+
+_recent_429_rate = 0.0
+
+
+def _note_response(is_429: bool) -> None:
+    global _recent_429_rate
+    sample = 1.0 if is_429 else 0.0
+    _recent_429_rate += EWMA_ALPHA * (sample - _recent_429_rate)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def retry_delay(backoff: float, attempt: int) -> float:
+    return backoff * (2**attempt) * random.uniform(0.5, 1.5)
+
+
+class RateLimiter:
+    def __init__(self, qps: float, jitter: float = DEFAULT_JITTER) -> None:
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._next_allowed = time.monotonic()
+
+    def acquire(self) -> None:
+        if self.interval <= 0:
+            return
+        interval = self.interval * (1.0 + _recent_429_rate)
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_allowed - now)
+            self._next_allowed = max(now, self._next_allowed) + interval
+        wait += random.uniform(0.0, self.jitter * interval)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AsyncRateLimiter:
+    def __init__(self, qps: float, jitter: float = DEFAULT_JITTER) -> None:
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self.jitter = jitter
+        self._lock = asyncio.Lock()
+        self._next_allowed = 0.0
+
+    async def acquire(self) -> None:
+        if self.interval <= 0:
+            return
+        interval = self.interval * (1.0 + _recent_429_rate)
+        async with self._lock:
+            now = time.monotonic()
+            if self._next_allowed <= 0.0:
+                self._next_allowed = now
+            wait = max(0.0, self._next_allowed - now)
+            self._next_allowed = max(now, self._next_allowed) + interval
+        wait += random.uniform(0.0, self.jitter * interval)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def sleep_to_qps(sleep_s: float) -> float:
+    return 1.0 / sleep_s if sleep_s > 0 else 0.0
+
+
+def make_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@dataclass(frozen=True)
+class KlineSchema:
+    base_keys: Tuple[str, ...]
+    kline_fields: Tuple[str, ...]
+    date_field: Optional[str]
+    date_index: int
+
+
+def make_schema(kline_fields: List[str], date_field: Optional[str]) -> KlineSchema:
+    columns = BASE_META_KEYS + tuple(kline_fields)
+    date_index = columns.index(date_field) if date_field in columns else -1
+    return KlineSchema(BASE_META_KEYS, tuple(kline_fields), date_field, date_index)
 
 
 def parse_fields(raw: str) -> List[str]:
@@ -76,20 +226,116 @@ def http_get_json(
     for attempt in range(retries):
         try:
             resp = session.get(url, params=params, timeout=timeout)
+        except requests.RequestException as exc:
+            if attempt == retries - 1:
+                print(f"request failed: {url} ({exc})", file=sys.stderr)
+                return None
+            time.sleep(retry_delay(backoff, attempt))
+            continue
+        if resp.status_code == 429:
+            _note_response(True)
+            if attempt == retries - 1:
+                print(f"request failed: {url} (429 rate limited)", file=sys.stderr)
+                return None
+            delay = parse_retry_after(resp.headers.get("Retry-After"))
+            time.sleep(delay if delay is not None else retry_delay(backoff, attempt))
+            continue
+        _note_response(False)
+        try:
             resp.raise_for_status()
+            if orjson is not None:
+                return orjson.loads(resp.content)
             return resp.json()
-        except requests.RequestException as exc:
+        except (requests.RequestException, ValueError) as exc:
+            if attempt == retries - 1:
+                print(f"request failed: {url} ({exc})", file=sys.stderr)
+                return None
+            time.sleep(retry_delay(backoff, attempt))
+    return None
+
+
+def have_async_client() -> bool:
+    return aiohttp is not None or httpx is not None
+
+
+def make_async_client(concurrency: int, timeout: int):
+    if httpx is not None:
+        limits = httpx.Limits(
+            max_connections=concurrency, max_keepalive_connections=concurrency
+        )
+        return httpx.AsyncClient(
+            http2=True, headers=DEFAULT_HEADERS, limits=limits, timeout=timeout
+        )
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    return aiohttp.ClientSession(headers=DEFAULT_HEADERS, connector=connector)
+
+
+async def _async_get(
+    session, url: str, params: Dict[str, str], timeout: int
+) -> Tuple[int, Dict[str, str], bytes]:
+    if httpx is not None and isinstance(session, httpx.AsyncClient):
+        resp = await session.get(url, params=params)
+        return resp.status_code, resp.headers, resp.content
+    async with session.get(
+        url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as resp:
+        body = await resp.read()
+        return resp.status, resp.headers, body
+
+
+async def async_http_get_json(
+    session,
+    url: str,
+    params: Dict[str, object],
+    retries: int,
+    backoff: float,
+    timeout: int,
+) -> Optional[Dict[str, object]]:
+    str_params = {key: str(value) for key, value in params.items()}
+    for attempt in range(retries):
+        try:
+            status, headers, body = await _async_get(
+                session, url, str_params, timeout
+            )
+        except ASYNC_ERRORS as exc:
+            if attempt == retries - 1:
+                print(f"request failed: {url} ({exc})", file=sys.stderr)
+                return None
+            await asyncio.sleep(retry_delay(backoff, attempt))
+            continue
+        if status == 429:
+            _note_response(True)
+            if attempt == retries - 1:
+                print(f"request failed: {url} (429 rate limited)", file=sys.stderr)
+                return None
+            delay = parse_retry_after(headers.get("Retry-After"))
+            if delay is None:
+                delay = retry_delay(backoff, attempt)
+            await asyncio.sleep(delay)
+            continue
+        _note_response(False)
+        if status >= 400:
+            if attempt == retries - 1:
+                print(f"request failed: {url} (HTTP {status})", file=sys.stderr)
+                return None
+            await asyncio.sleep(retry_delay(backoff, attempt))
+            continue
+        try:
+            if orjson is not None:
+                return orjson.loads(body)
+            return json.loads(body)
+        except ValueError as exc:
             if attempt == retries - 1:
                 print(f"request failed: {url} ({exc})", file=sys.stderr)
                 return None
-            time.sleep(backoff * (2**attempt))
+            await asyncio.sleep(retry_delay(backoff, attempt))
     return None
 
 
 def fetch_star_list(
     session: requests.Session,
     page_size: int,
-    sleep_s: float,
+    limiter: RateLimiter,
     max_stocks: Optional[int],
     list_fs: str,
     retries: int,
@@ -113,7 +359,6 @@ def fetch_star_list(
 
     items: List[Dict[str, str]] = []
     total_pages = None
-    page = 1
 
     def append_items(rows: Iterable[Dict[str, object]]) -> bool:
         for row in rows:
@@ -134,50 +379,57 @@ def fetch_star_list(
                 return True
         return False
 
-    while True:
-        params["pn"] = page
-        payload = http_get_json(
-            session, LIST_URL, params, retries, backoff, timeout
+    def fetch_page(page: int) -> Optional[Dict[str, object]]:
+        limiter.acquire()
+        return http_get_json(
+            session, LIST_URL, dict(params, pn=page), retries, backoff, timeout
         )
+
+    payload = fetch_page(1)
+    if not payload or not isinstance(payload, dict):
+        raise RuntimeError("failed to fetch stock list")
+    data = payload.get("data") or {}
+    diff = data.get("diff") or []
+    total = data.get("total")
+    if isinstance(total, int) and total > 0:
+        total_pages = max(1, int(math.ceil(total / page_size)))
+    if max_stocks:
+        needed = max(1, int(math.ceil(max_stocks / page_size)))
+        total_pages = needed if total_pages is None else min(total_pages, needed)
+    if not diff or append_items(diff):
+        return items
+
+    if total_pages is not None:
+        if total_pages <= 1:
+            return items
+        pages = range(2, total_pages + 1)
+        workers = min(LIST_WORKERS, total_pages - 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for payload in executor.map(fetch_page, pages):
+                if not payload or not isinstance(payload, dict):
+                    continue
+                diff = (payload.get("data") or {}).get("diff") or []
+                if append_items(diff):
+                    break
+        return items
+
+    page = 2
+    while True:
+        payload = fetch_page(page)
         if not payload or not isinstance(payload, dict):
-            if page == 1:
-                raise RuntimeError("failed to fetch stock list")
             break
-        data = payload.get("data") or {}
-        diff = data.get("diff") or []
-        if page == 1:
-            total = data.get("total")
-            if isinstance(total, int) and total > 0:
-                total_pages = max(1, int(math.ceil(total / page_size)))
+        diff = (payload.get("data") or {}).get("diff") or []
         if not diff:
             break
-        stop = append_items(diff)
-        if stop:
-            break
-        if total_pages and page >= total_pages:
+        if append_items(diff):
             break
-        if not total_pages and len(diff) < page_size:
+        if len(diff) < page_size:
             break
         page += 1
-        time.sleep(sleep_s)
 
     return items
 
 
-def read_csv_header(path: str) -> Optional[List[str]]:
-    if not os.path.exists(path):
-        return None
-    with open(path, newline="", encoding="utf-8") as handle:
-        reader = csv.reader(handle)
-        return next(reader, None)
-
-def parse_date_int(value: str) -> Optional[int]:
-    cleaned = value.strip().replace("-", "").replace("/", "")
-    if len(cleaned) != 8 or not cleaned.isdigit():
-        return None
-    return int(cleaned)
-
-
 def compute_recent_beg(recent_days: Optional[int]) -> Optional[int]:
     if not recent_days or recent_days <= 0:
         return None
@@ -185,40 +437,93 @@ def compute_recent_beg(recent_days: Optional[int]) -> Optional[int]:
     return int(start.strftime("%Y%m%d"))
 
 
-def read_existing_dates(path: str, date_field: str) -> Tuple[set, Optional[int]]:
+@functools.lru_cache(maxsize=None)
+def scan_existing(
+    path: str, date_field: Optional[str]
+) -> Tuple[Optional[Tuple[str, ...]], int, Optional[int]]:
     if not os.path.exists(path):
-        return set(), None
-    dates = set()
-    latest = None
-    with open(path, newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            value = row.get(date_field)
-            if value:
-                dates.add(value)
-                parsed = parse_date_int(value)
-                if parsed is not None:
-                    if latest is None or parsed > latest:
-                        latest = parsed
-    return dates, latest
+        return None, 0, None
+    try:
+        df = pd.read_csv(path, dtype=str, engine="c")
+    except (OSError, ValueError):
+        return None, 0, None
+    header = tuple(df.columns)
+    nrows = len(df)
+    if not date_field or date_field not in df.columns:
+        return header, nrows, None
+    values = df[date_field].dropna()
+    cleaned = (
+        values.str.strip()
+        .str.replace("-", "", regex=False)
+        .str.replace("/", "", regex=False)
+    )
+    valid = cleaned[cleaned.str.fullmatch(r"\d{8}")]
+    latest = int(valid.astype("int64").max()) if len(valid) else None
+    return header, nrows, latest
+
+
+def read_csv_header(path: str) -> Optional[List[str]]:
+    try:
+        with open(path, newline="", encoding="utf-8") as handle:
+            return next(csv.reader(handle), None)
+    except OSError:
+        return None
 
 
 def write_csv_rows(
     path: str,
     header: List[str],
-    rows: List[Dict[str, str]],
+    rows: List[List[str]],
     overwrite: bool,
 ) -> None:
     if not rows:
         return
+    if isinstance(rows[0], dict):
+        rows = [[row.get(key, "") for key in header] for row in rows]
     file_exists = os.path.exists(path)
     mode = "w" if overwrite or not file_exists else "a"
-    with open(path, mode, newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=header)
+    with open(
+        path, mode, buffering=WRITE_BUFFER, newline="", encoding="utf-8"
+    ) as handle:
+        writer = csv.writer(handle)
         if overwrite or not file_exists:
-            writer.writeheader()
-        for row in rows:
-            writer.writerow({key: row.get(key, "") for key in header})
+            writer.writerow(header)
+        writer.writerows(rows)
+
+
+def kline_cache_path(
+    cache_dir: str, secid: str, beg: int, end: int, klt: int, fqt: int
+) -> str:
+    key = hashlib.sha1(f"{secid}-{beg}-{end}-{klt}-{fqt}".encode()).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json.gz")
+
+
+def load_cached_json(path: str, ttl: float) -> Optional[Dict[str, object]]:
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with gzip.open(path, "rb") as handle:
+            body = handle.read()
+    except OSError:
+        return None
+    try:
+        if orjson is not None:
+            return orjson.loads(body)
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def store_cached_json(path: str, data: Dict[str, object]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wb") as handle:
+        handle.write(body)
+    os.replace(tmp_path, path)
 
 
 def fetch_kline_data(
@@ -235,7 +540,15 @@ def fetch_kline_data(
     backoff: float,
     timeout: int,
     ut: Optional[str],
+    cache_dir: Optional[str] = None,
+    cache_ttl: float = DEFAULT_CACHE_TTL,
 ) -> Optional[Dict[str, object]]:
+    cache_file = None
+    if cache_dir and cache_ttl > 0:
+        cache_file = kline_cache_path(cache_dir, secid, beg, end, klt, fqt)
+        cached = load_cached_json(cache_file, cache_ttl)
+        if cached is not None:
+            return cached
     params = {
         "secid": secid,
         "fields1": fields1,
@@ -251,29 +564,90 @@ def fetch_kline_data(
     payload = http_get_json(session, KLINE_URL, params, retries, backoff, timeout)
     if not payload or not isinstance(payload, dict):
         return None
-    return payload.get("data")
+    data = payload.get("data")
+    if data and cache_file:
+        store_cached_json(cache_file, data)
+    return data
+
+
+async def async_fetch_kline_data(
+    session,
+    secid: str,
+    fields1: str,
+    fields2: str,
+    klt: int,
+    fqt: int,
+    beg: int,
+    end: int,
+    limit: int,
+    retries: int,
+    backoff: float,
+    timeout: int,
+    ut: Optional[str],
+    cache_dir: Optional[str] = None,
+    cache_ttl: float = DEFAULT_CACHE_TTL,
+) -> Optional[Dict[str, object]]:
+    cache_file = None
+    if cache_dir and cache_ttl > 0:
+        cache_file = kline_cache_path(cache_dir, secid, beg, end, klt, fqt)
+        cached = load_cached_json(cache_file, cache_ttl)
+        if cached is not None:
+            return cached
+    params = {
+        "secid": secid,
+        "fields1": fields1,
+        "fields2": fields2,
+        "klt": klt,
+        "fqt": fqt,
+        "beg": beg,
+        "end": end,
+        "lmt": limit,
+    }
+    if ut:
+        params["ut"] = ut
+    payload = await async_http_get_json(
+        session, KLINE_URL, params, retries, backoff, timeout
+    )
+    if not payload or not isinstance(payload, dict):
+        return None
+    data = payload.get("data")
+    if data and cache_file:
+        store_cached_json(cache_file, data)
+    return data
 
 
 def build_rows(
     data: Dict[str, object],
     base_meta: Dict[str, str],
-    kline_fields: List[str],
-) -> List[Dict[str, str]]:
-    rows: List[Dict[str, str]] = []
+    schema: KlineSchema,
+    header: List[str],
+    meta_keys: List[str],
+) -> List[List[str]]:
     kline_values = data.get("klines") or []
-    meta_keys = [key for key in data.keys() if key != "klines"]
 
+    positions = {column: idx for idx, column in enumerate(header)}
+    template = [""] * len(header)
+    for key, value in base_meta.items():
+        slot = positions.get(key)
+        if slot is not None:
+            template[slot] = value
+    for key in meta_keys:
+        if key in base_meta:
+            continue
+        slot = positions.get(f"meta_{key}")
+        if slot is not None:
+            template[slot] = str(data.get(key, ""))
+    kline_slots = [positions.get(field) for field in schema.kline_fields]
+
+    rows: List[List[str]] = []
     for raw in kline_values:
         if not isinstance(raw, str):
             continue
         values = raw.split(",")
-        row: Dict[str, str] = dict(base_meta)
-        for idx, field in enumerate(kline_fields):
-            row[field] = values[idx] if idx < len(values) else ""
-        for key in meta_keys:
-            if key in base_meta:
-                continue
-            row[f"meta_{key}"] = str(data.get(key, ""))
+        row = list(template)
+        for idx, slot in enumerate(kline_slots):
+            if slot is not None:
+                row[slot] = values[idx] if idx < len(values) else ""
         rows.append(row)
     return rows
 
@@ -289,6 +663,314 @@ def write_stock_list_csv(path: str, items: List[Dict[str, str]]) -> None:
     write_csv_rows(path, header, rows, overwrite=True)
 
 
+INDEX_NAME = ".index.json"
+
+
+def load_index(daily_dir: str) -> Dict[str, Dict[str, int]]:
+    path = os.path.join(daily_dir, INDEX_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_index(daily_dir: str, index: Dict[str, Dict[str, int]]) -> None:
+    path = os.path.join(daily_dir, INDEX_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(index, handle)
+    os.replace(tmp_path, path)
+
+
+def update_index_entry(
+    index: Dict[str, Dict[str, int]],
+    code: str,
+    written: int,
+    max_date: Optional[int],
+    base_rows: int,
+    output_path: str,
+) -> None:
+    if not written or max_date is None:
+        return
+    entry = index.get(code) or {}
+    prev_latest = entry.get("latest_date") or 0
+    entry["latest_date"] = max(prev_latest, max_date)
+    entry["rows"] = int(entry.get("rows") or base_rows) + written
+    try:
+        entry["size"] = os.path.getsize(output_path)
+    except OSError:
+        entry.pop("size", None)
+    index[code] = entry
+
+
+def index_latest_date(
+    index: Dict[str, Dict[str, int]], code: str, output_path: str
+) -> Optional[int]:
+    entry = index.get(code)
+    if not entry or not entry.get("latest_date") or not entry.get("size"):
+        return None
+    try:
+        if os.path.getsize(output_path) != entry["size"]:
+            return None
+    except OSError:
+        return None
+    return int(entry["latest_date"])
+
+
+def parquet_root(out_dir: str) -> str:
+    return os.path.join(out_dir, "daily.parquet")
+
+
+def parquet_latest_date(root: str, code: str) -> Optional[int]:
+    if not os.path.isdir(root):
+        return None
+    try:
+        table = pq.read_table(root, columns=["date"], filters=[("code", "=", code)])
+    except (OSError, KeyError, pa.ArrowInvalid):
+        return None
+    values = table.column("date").to_pylist()
+    if not values:
+        return None
+    parsed = parse_date_int_array(np.asarray(values, dtype=str))
+    parsed = parsed[parsed > 0]
+    return int(parsed.max()) if parsed.size else None
+
+
+def compute_parquet_beg(
+    root: str,
+    code: str,
+    beg: int,
+    recent_beg: Optional[int],
+    overwrite: bool,
+) -> Tuple[int, Optional[int]]:
+    latest_date = None if overwrite else parquet_latest_date(root, code)
+    effective_beg = beg
+    if latest_date is not None:
+        effective_beg = max(effective_beg, latest_date)
+    if recent_beg is not None:
+        effective_beg = max(effective_beg, recent_beg)
+    return effective_beg, latest_date
+
+
+def store_kline_parquet(
+    item: Dict[str, str],
+    data: Dict[str, object],
+    schema: KlineSchema,
+    latest_date: Optional[int],
+    root: str,
+) -> None:
+    code = item["code"]
+    base_meta = {
+        "code": item["code"],
+        "name": item.get("name", ""),
+        "market": item.get("market", ""),
+        "secid": item.get("secid", ""),
+    }
+    header = list(schema.base_keys) + list(schema.kline_fields)
+    meta_keys = [key for key in data.keys() if key != "klines"]
+    for key in meta_keys:
+        if key in base_meta:
+            continue
+        header.append(f"meta_{key}")
+
+    rows = build_rows(data, base_meta, schema, header, meta_keys)
+    date_slot = schema.date_index if schema.date_index >= 0 else None
+    if date_slot is not None and latest_date is not None:
+        rows = [
+            row
+            for row in rows
+            if (parsed := parse_date_int(row[date_slot])) is not None
+            and parsed > latest_date
+        ]
+    if not rows:
+        print(f"skip {code}: no new kline rows", file=sys.stderr)
+        return
+    table = pa.table(
+        {
+            column: [row[idx] for row in rows]
+            for idx, column in enumerate(header)
+        }
+    )
+    pq.write_to_dataset(
+        table, root_path=root, partition_cols=["code"], compression="zstd"
+    )
+
+
+def compute_effective_beg(
+    output_path: str,
+    date_field: Optional[str],
+    beg: int,
+    recent_beg: Optional[int],
+    overwrite: bool,
+) -> Tuple[int, Optional[int], int]:
+    latest_date = None
+    existing_rows = 0
+    effective_beg = beg
+    if date_field and not overwrite:
+        _, existing_rows, latest_date = scan_existing(output_path, date_field)
+        if latest_date is not None:
+            effective_beg = max(effective_beg, latest_date)
+    if recent_beg is not None:
+        effective_beg = max(effective_beg, recent_beg)
+    return effective_beg, latest_date, existing_rows
+
+
+def store_kline_data(
+    item: Dict[str, str],
+    data: Dict[str, object],
+    schema: KlineSchema,
+    latest_date: Optional[int],
+    output_path: str,
+    overwrite: bool,
+) -> Tuple[int, Optional[int]]:
+    code = item["code"]
+    base_meta = {
+        "code": item["code"],
+        "name": item.get("name", ""),
+        "market": item.get("market", ""),
+        "secid": item.get("secid", ""),
+    }
+    existing_header = read_csv_header(output_path)
+    computed_header = list(schema.base_keys) + list(schema.kline_fields)
+    meta_keys = [key for key in data.keys() if key != "klines"]
+    for key in meta_keys:
+        if key in base_meta:
+            continue
+        computed_header.append(f"meta_{key}")
+
+    header = existing_header or computed_header
+    if existing_header:
+        missing = set(computed_header) - set(existing_header)
+        if missing:
+            print(
+                f"warning {code}: header missing {sorted(missing)}",
+                file=sys.stderr,
+            )
+
+    rows = build_rows(data, base_meta, schema, header, meta_keys)
+    if not rows:
+        print(f"skip {code}: no kline rows", file=sys.stderr)
+        return 0, None
+
+    if existing_header is None:
+        date_slot = schema.date_index if schema.date_index >= 0 else None
+    elif schema.date_field in header:
+        date_slot = header.index(schema.date_field)
+    else:
+        date_slot = None
+    if date_slot is not None and not overwrite and latest_date is not None:
+        rows = [
+            row
+            for row in rows
+            if (parsed := parse_date_int(row[date_slot])) is not None
+            and parsed > latest_date
+        ]
+
+    write_csv_rows(output_path, header, rows, overwrite=overwrite)
+    max_date = None
+    if date_slot is not None:
+        for row in rows:
+            parsed = parse_date_int(row[date_slot])
+            if parsed is not None and (max_date is None or parsed > max_date):
+                max_date = parsed
+    return len(rows), max_date
+
+
+async def fetch_all_async(
+    items: List[Dict[str, str]],
+    args: argparse.Namespace,
+    schema: KlineSchema,
+    recent_beg: Optional[int],
+    daily_dir: str,
+    index: Optional[Dict[str, Dict[str, int]]] = None,
+) -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limiter = AsyncRateLimiter(sleep_to_qps(args.sleep))
+    cache_dir = os.path.join(args.out_dir, "cache") if args.cache_ttl > 0 else None
+    async with make_async_client(args.concurrency, args.timeout) as session:
+
+        async def process_item(item: Dict[str, str]) -> None:
+            code = item["code"]
+            output_path = os.path.join(daily_dir, f"{code}.csv")
+            latest_date = None
+            existing_rows = 0
+            if args.parquet:
+                effective_beg, latest_date = compute_parquet_beg(
+                    parquet_root(args.out_dir),
+                    code,
+                    args.beg,
+                    recent_beg,
+                    args.overwrite,
+                )
+            else:
+                indexed_latest = None
+                if index is not None and not args.overwrite:
+                    indexed_latest = index_latest_date(index, code, output_path)
+                if indexed_latest is not None:
+                    latest_date = indexed_latest
+                    effective_beg = max(args.beg, latest_date)
+                    if recent_beg is not None:
+                        effective_beg = max(effective_beg, recent_beg)
+                else:
+                    effective_beg, latest_date, existing_rows = (
+                        compute_effective_beg(
+                            output_path, schema.date_field, args.beg,
+                            recent_beg, args.overwrite,
+                        )
+                    )
+            async with semaphore:
+                await limiter.acquire()
+                data = await async_fetch_kline_data(
+                    session,
+                    secid=item["secid"],
+                    fields1=args.fields1,
+                    fields2=args.fields2,
+                    klt=args.klt,
+                    fqt=args.fqt,
+                    beg=effective_beg,
+                    end=args.end,
+                    limit=args.limit,
+                    retries=args.retries,
+                    backoff=args.backoff,
+                    timeout=args.timeout,
+                    ut=args.ut,
+                    cache_dir=cache_dir,
+                    cache_ttl=args.cache_ttl,
+                )
+            if not data:
+                print(f"skip {code}: empty response", file=sys.stderr)
+                return
+            if args.parquet:
+                store_kline_parquet(
+                    item,
+                    data,
+                    schema,
+                    latest_date,
+                    parquet_root(args.out_dir),
+                )
+            else:
+                written, max_date = store_kline_data(
+                    item,
+                    data,
+                    schema,
+                    latest_date,
+                    output_path,
+                    args.overwrite,
+                )
+                if index is not None:
+                    update_index_entry(
+                        index, code, written, max_date, existing_rows,
+                        output_path,
+                    )
+
+        tasks = [asyncio.ensure_future(process_item(item)) for item in items]
+        await asyncio.gather(*tasks)
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(
         description="Fetch STAR Market daily kline data from Eastmoney."
@@ -320,20 +1002,46 @@ def main() -> int:
     parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
     parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
     parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Number of kline fetches in flight (requires aiohttp or httpx).",
+    )
     parser.add_argument("--ut", default=DEFAULT_UT)
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        help="Seconds to reuse cached kline JSON (0 disables the cache).",
+    )
     parser.add_argument(
         "--overwrite",
         action="store_true",
         help="Overwrite existing per-stock CSV files.",
     )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help=(
+            "Append rows to a code-partitioned Parquet dataset "
+            "(out-dir/daily.parquet) instead of per-stock CSV files "
+            "(requires pyarrow)."
+        ),
+    )
     args = parser.parse_args()
 
-    session = requests.Session()
-    session.headers.update(DEFAULT_HEADERS)
+    if args.parquet and pq is None:
+        print("--parquet requires pyarrow", file=sys.stderr)
+        return 2
+
+    session = make_session()
+    limiter = RateLimiter(sleep_to_qps(args.sleep))
 
     out_dir = args.out_dir
     daily_dir = os.path.join(out_dir, "daily")
     os.makedirs(daily_dir, exist_ok=True)
+    cache_dir = os.path.join(out_dir, "cache") if args.cache_ttl > 0 else None
 
     if args.codes:
         codes = [code.strip() for code in args.codes.split(",") if code.strip()]
@@ -345,7 +1053,7 @@ def main() -> int:
         items = fetch_star_list(
             session,
             page_size=200,
-            sleep_s=args.sleep,
+            limiter=limiter,
             max_stocks=args.max_stocks,
             list_fs=args.list_fs,
             retries=args.retries,
@@ -359,23 +1067,27 @@ def main() -> int:
     fields2_list = parse_fields(args.fields2)
     kline_fields = build_kline_field_names(fields2_list)
     date_field = "date" if "date" in kline_fields else None
+    schema = make_schema(kline_fields, date_field)
     recent_beg = compute_recent_beg(args.recent_days)
 
+    if have_async_client() and args.concurrency > 1:
+        asyncio.run(fetch_all_async(items, args, schema, recent_beg, daily_dir))
+        return 0
+
     for item in items:
         code = item["code"]
         secid = item["secid"]
         output_path = os.path.join(daily_dir, f"{code}.csv")
-        existing_dates = set()
         latest_date = None
-        effective_beg = args.beg
-        if date_field and not args.overwrite:
-            existing_dates, latest_date = read_existing_dates(
-                output_path, date_field
+        if args.parquet:
+            effective_beg, latest_date = compute_parquet_beg(
+                parquet_root(out_dir), code, args.beg, recent_beg, args.overwrite
             )
-            if latest_date is not None:
-                effective_beg = max(effective_beg, latest_date)
-        if recent_beg is not None:
-            effective_beg = max(effective_beg, recent_beg)
+        else:
+            effective_beg, latest_date, _ = compute_effective_beg(
+                output_path, schema.date_field, args.beg, recent_beg, args.overwrite
+            )
+        limiter.acquire()
         data = fetch_kline_data(
             session,
             secid=secid,
@@ -390,43 +1102,29 @@ def main() -> int:
             backoff=args.backoff,
             timeout=args.timeout,
             ut=args.ut,
+            cache_dir=cache_dir,
+            cache_ttl=args.cache_ttl,
         )
         if not data:
             print(f"skip {code}: empty response", file=sys.stderr)
             continue
-        base_meta = {
-            "code": item["code"],
-            "name": item.get("name", ""),
-            "market": item.get("market", ""),
-            "secid": item.get("secid", ""),
-        }
-        rows = build_rows(data, base_meta, kline_fields)
-        if not rows:
-            print(f"skip {code}: no kline rows", file=sys.stderr)
-            continue
-
-        existing_header = read_csv_header(output_path)
-        computed_header = list(base_meta.keys()) + kline_fields
-        meta_keys = [key for key in data.keys() if key != "klines"]
-        for key in meta_keys:
-            if key in base_meta:
-                continue
-            computed_header.append(f"meta_{key}")
-
-        header = existing_header or computed_header
-        if existing_header:
-            missing = set(computed_header) - set(existing_header)
-            if missing:
-                print(
-                    f"warning {code}: header missing {sorted(missing)}",
-                    file=sys.stderr,
-                )
-
-        if date_field and not args.overwrite:
-            rows = [row for row in rows if row.get(date_field) not in existing_dates]
-
-        write_csv_rows(output_path, header, rows, overwrite=args.overwrite)
-        time.sleep(args.sleep)
+        if args.parquet:
+            store_kline_parquet(
+                item,
+                data,
+                schema,
+                latest_date,
+                parquet_root(out_dir),
+            )
+        else:
+            store_kline_data(
+                item,
+                data,
+                schema,
+                latest_date,
+                output_path,
+                args.overwrite,
+            )
 
     return 0
 
@@ -1,20 +1,21 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import os
 import sys
-import time
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 
 import requests
 
 from kcb_daily import (
     DEFAULT_BACKOFF,
     DEFAULT_BEG,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_CONCURRENCY,
     DEFAULT_END,
     DEFAULT_FIELDS1,
     DEFAULT_FIELDS2,
     DEFAULT_FQT,
-    DEFAULT_HEADERS,
     DEFAULT_KLT,
     DEFAULT_LIMIT,
     DEFAULT_RETRIES,
@@ -22,38 +23,37 @@ from kcb_daily import (
     DEFAULT_TIMEOUT,
     DEFAULT_UT,
     LIST_FS,
+    RateLimiter,
     build_kline_field_names,
-    build_rows,
+    compute_effective_beg,
+    fetch_all_async,
     fetch_kline_data,
     fetch_star_list,
+    compute_parquet_beg,
+    have_async_client,
+    index_latest_date,
+    load_index,
+    make_schema,
+    make_session,
     parse_fields,
-    read_csv_header,
-    read_existing_dates,
-    write_csv_rows,
+    parquet_root,
+    pq,
+    save_index,
+    sleep_to_qps,
+    store_kline_data,
+    store_kline_parquet,
+    update_index_entry,
     write_stock_list_csv,
 )
 
 
-def build_header(
-    base_meta: Dict[str, str],
-    kline_fields: List[str],
-    data: Dict[str, object],
-) -> List[str]:
-    header = list(base_meta.keys()) + kline_fields
-    for key in data.keys():
-        if key == "klines" or key in base_meta:
-            continue
-        header.append(f"meta_{key}")
-    return header
-
-
 def prepare_items(
     session: requests.Session,
     codes: Optional[str],
     out_dir: str,
     list_fs: str,
     max_stocks: Optional[int],
-    sleep_s: float,
+    limiter: RateLimiter,
     retries: int,
     backoff: float,
     timeout: int,
@@ -69,7 +69,7 @@ def prepare_items(
     items = fetch_star_list(
         session,
         page_size=200,
-        sleep_s=sleep_s,
+        limiter=limiter,
         max_stocks=max_stocks,
         list_fs=list_fs,
         retries=retries,
@@ -82,16 +82,6 @@ def prepare_items(
     return items
 
 
-def load_existing_state(
-    path: str, date_field: Optional[str]
-) -> Tuple[set, Optional[int], Optional[List[str]]]:
-    header = read_csv_header(path)
-    if not date_field or not header or date_field not in header:
-        return set(), None, header
-    dates, latest_date = read_existing_dates(path, date_field)
-    return dates, latest_date, header
-
-
 def main() -> int:
     parser = argparse.ArgumentParser(
         description="Incrementally update STAR Market daily kline data."
@@ -117,20 +107,46 @@ def main() -> int:
     parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
     parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
     parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Number of kline fetches in flight (requires aiohttp or httpx).",
+    )
     parser.add_argument("--ut", default=DEFAULT_UT)
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        help="Seconds to reuse cached kline JSON (0 disables the cache).",
+    )
     parser.add_argument(
         "--overwrite",
         action="store_true",
         help="Overwrite existing per-stock CSV files.",
     )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help=(
+            "Append rows to a code-partitioned Parquet dataset "
+            "(out-dir/daily.parquet) instead of per-stock CSV files "
+            "(requires pyarrow)."
+        ),
+    )
     args = parser.parse_args()
 
-    session = requests.Session()
-    session.headers.update(DEFAULT_HEADERS)
+    if args.parquet and pq is None:
+        print("--parquet requires pyarrow", file=sys.stderr)
+        return 2
+
+    session = make_session()
+    limiter = RateLimiter(sleep_to_qps(args.sleep))
 
     out_dir = args.out_dir
     daily_dir = os.path.join(out_dir, "daily")
     os.makedirs(daily_dir, exist_ok=True)
+    cache_dir = os.path.join(out_dir, "cache") if args.cache_ttl > 0 else None
 
     items = prepare_items(
         session=session,
@@ -138,7 +154,7 @@ def main() -> int:
         out_dir=out_dir,
         list_fs=args.list_fs,
         max_stocks=args.max_stocks,
-        sleep_s=args.sleep,
+        limiter=limiter,
         retries=args.retries,
         backoff=args.backoff,
         timeout=args.timeout,
@@ -148,23 +164,42 @@ def main() -> int:
     fields2_list = parse_fields(args.fields2)
     kline_fields = build_kline_field_names(fields2_list)
     date_field = "date" if "date" in kline_fields else None
+    schema = make_schema(kline_fields, date_field)
+    index = {} if args.parquet else load_index(daily_dir)
+
+    if have_async_client() and args.concurrency > 1:
+        asyncio.run(
+            fetch_all_async(
+                items, args, schema, None, daily_dir,
+                index=index if not args.parquet else None,
+            )
+        )
+        if not args.parquet:
+            save_index(daily_dir, index)
+        return 0
 
     for item in items:
         code = item["code"]
         secid = item["secid"]
         output_path = os.path.join(daily_dir, f"{code}.csv")
-        existing_dates = set()
         latest_date = None
-        existing_header = None
-        if not args.overwrite:
-            existing_dates, latest_date, existing_header = load_existing_state(
-                output_path, date_field
+        existing_rows = 0
+        if args.parquet:
+            effective_beg, latest_date = compute_parquet_beg(
+                parquet_root(out_dir), code, args.beg, None, args.overwrite
             )
-
-        effective_beg = args.beg
-        if latest_date is not None:
-            effective_beg = max(effective_beg, latest_date)
-
+        else:
+            indexed_latest = None
+            if not args.overwrite:
+                indexed_latest = index_latest_date(index, code, output_path)
+            if indexed_latest is not None:
+                latest_date = indexed_latest
+                effective_beg = max(args.beg, latest_date)
+            else:
+                effective_beg, latest_date, existing_rows = compute_effective_beg(
+                    output_path, schema.date_field, args.beg, None, args.overwrite
+                )
+        limiter.acquire()
         data = fetch_kline_data(
             session,
             secid=secid,
@@ -179,38 +214,35 @@ def main() -> int:
             backoff=args.backoff,
             timeout=args.timeout,
             ut=args.ut,
+            cache_dir=cache_dir,
+            cache_ttl=args.cache_ttl,
         )
         if not data:
             print(f"skip {code}: empty response", file=sys.stderr)
             continue
+        if args.parquet:
+            store_kline_parquet(
+                item,
+                data,
+                schema,
+                latest_date,
+                parquet_root(out_dir),
+            )
+        else:
+            written, max_date = store_kline_data(
+                item,
+                data,
+                schema,
+                latest_date,
+                output_path,
+                args.overwrite,
+            )
+            update_index_entry(
+                index, code, written, max_date, existing_rows, output_path
+            )
 
-        base_meta = {
-            "code": item["code"],
-            "name": item.get("name", ""),
-            "market": item.get("market", ""),
-            "secid": item.get("secid", ""),
-        }
-        rows = build_rows(data, base_meta, kline_fields)
-        if not rows:
-            print(f"skip {code}: no kline rows", file=sys.stderr)
-            continue
-
-        computed_header = build_header(base_meta, kline_fields, data)
-        header = existing_header or computed_header
-        if existing_header:
-            missing = set(computed_header) - set(existing_header)
-            if missing:
-                print(
-                    f"warning {code}: header missing {sorted(missing)}",
-                    file=sys.stderr,
-                )
-
-        if date_field and not args.overwrite:
-            rows = [row for row in rows if row.get(date_field) not in existing_dates]
-
-        write_csv_rows(output_path, header, rows, overwrite=args.overwrite)
-        time.sleep(args.sleep)
-
+    if not args.parquet:
+        save_index(daily_dir, index)
     return 0
 
 
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _ma_cross_scan_loop(
+    closes: np.ndarray, window: int, lookback: int
+) -> Tuple[int, int, float]:
+    count = closes.shape[0]
+    window_sum = 0.0
+    for idx in range(window):
+        window_sum += closes[idx]
+    prev_ma = window_sum / window
+    window_start = count - lookback
+    if window_start < window:
+        window_start = window
+
+    down_idx = -1
+    up_idx = -1
+    ma = prev_ma
+    for idx in range(window, count):
+        window_sum += closes[idx] - closes[idx - window]
+        ma = window_sum / window
+        if idx >= window_start:
+            prev_close = closes[idx - 1]
+            cur_close = closes[idx]
+            if down_idx == -1:
+                if prev_close >= prev_ma and cur_close < ma:
+                    down_idx = idx
+            elif up_idx == -1:
+                if prev_close < prev_ma and cur_close >= ma:
+                    up_idx = idx
+        prev_ma = ma
+    return down_idx, up_idx, ma
+
+
+if njit is not None:
+    ma_cross_scan = njit(
+        "Tuple((int64, int64, float64))(float64[:], int64, int64)",
+        cache=True,
+        fastmath=True,
+        boundscheck=False,
+    )(_ma_cross_scan_loop)
+else:
+    ma_cross_scan = _ma_cross_scan_loop
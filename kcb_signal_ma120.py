@@ -1,65 +1,64 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import functools
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
 
-def parse_date_int(value: str) -> Optional[int]:
-    cleaned = value.strip().replace("-", "").replace("/", "")
-    if len(cleaned) != 8 or not cleaned.isdigit():
-        return None
-    return int(cleaned)
+from kcb_kernels import ma_cross_scan
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+SERIES_COLUMNS = {"date", "f51", "close", "f53", "code", "name"}
 
 
-def parse_float(value: str) -> Optional[float]:
+def load_series(path: str) -> Optional[Tuple[str, str, List[Tuple[int, str, float]]]]:
     try:
-        return float(value)
-    except (TypeError, ValueError):
+        df = pd.read_csv(
+            path,
+            usecols=lambda column: column in SERIES_COLUMNS,
+            dtype=str,
+            engine="c",
+        )
+    except (OSError, ValueError):
+        return None
+    fields = df.columns
+    date_field = "date" if "date" in fields else "f51" if "f51" in fields else None
+    close_field = "close" if "close" in fields else "f53" if "f53" in fields else None
+    if not date_field or not close_field:
         return None
 
+    date_raw = df[date_field].fillna("").str.strip()
+    cleaned = date_raw.str.replace("-", "", regex=False).str.replace(
+        "/", "", regex=False
+    )
+    date_int = pd.to_numeric(
+        cleaned.where(cleaned.str.fullmatch(r"\d{8}")), errors="coerce"
+    )
+    close = pd.to_numeric(df[close_field], errors="coerce")
+    mask = date_int.notna() & close.notna()
+    if not mask.any():
+        return None
 
-def compute_ma(values: List[float], window: int) -> List[Optional[float]]:
-    count = len(values)
-    ma = [None] * count
-    if count < window:
-        return ma
-    window_sum = sum(values[:window])
-    ma[window - 1] = window_sum / window
-    for idx in range(window, count):
-        window_sum += values[idx] - values[idx - window]
-        ma[idx] = window_sum / window
-    return ma
-
+    first = mask.idxmax()
+    code = str(df["code"].fillna("")[first]).strip() if "code" in fields else ""
+    name = str(df["name"].fillna("")[first]).strip() if "name" in fields else ""
 
-def load_series(path: str) -> Optional[Tuple[str, str, List[Tuple[int, str, float]]]]:
-    with open(path, newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        if not reader.fieldnames:
-            return None
-        fields = reader.fieldnames
-        date_field = "date" if "date" in fields else "f51" if "f51" in fields else None
-        close_field = "close" if "close" in fields else "f53" if "f53" in fields else None
-        if not date_field or not close_field:
-            return None
-
-        code = ""
-        name = ""
-        rows: List[Tuple[int, str, float]] = []
-        for row in reader:
-            date_raw = (row.get(date_field) or "").strip()
-            date_int = parse_date_int(date_raw)
-            close_val = parse_float(row.get(close_field, ""))
-            if date_int is None or close_val is None:
-                continue
-            if not code:
-                code = (row.get("code") or "").strip()
-                name = (row.get("name") or "").strip()
-            rows.append((date_int, date_raw, close_val))
-
-    if not rows:
-        return None
+    rows = list(
+        zip(
+            date_int[mask].astype("int64").tolist(),
+            date_raw[mask].tolist(),
+            close[mask].tolist(),
+        )
+    )
     rows.sort(key=lambda item: item[0])
     return code, name, rows
 
@@ -69,31 +68,12 @@ def find_signal(
     window_days: int,
     ma_window: int,
 ) -> Optional[Dict[str, str]]:
-    if len(rows) < ma_window:
-        return None
-    closes = [row[2] for row in rows]
-    ma_values = compute_ma(closes, ma_window)
     count = len(rows)
-    window_start = max(ma_window - 1, count - window_days)
-
-    down_idx = None
-    up_idx = None
-    for idx in range(window_start, count):
-        if idx == 0 or ma_values[idx] is None or ma_values[idx - 1] is None:
-            continue
-        prev_close = closes[idx - 1]
-        prev_ma = ma_values[idx - 1]
-        close = closes[idx]
-        cur_ma = ma_values[idx]
-        if down_idx is None:
-            if prev_close >= prev_ma and close < cur_ma:
-                down_idx = idx
-        else:
-            if prev_close < prev_ma and close >= cur_ma:
-                up_idx = idx
-                break
-
-    if down_idx is None or up_idx is None:
+    if count < ma_window:
+        return None
+    closes = np.fromiter((row[2] for row in rows), dtype=np.float64, count=count)
+    down_idx, up_idx, last_ma = ma_cross_scan(closes, ma_window, window_days)
+    if down_idx < 0 or up_idx < 0:
         return None
 
     last_idx = count - 1
@@ -102,10 +82,75 @@ def find_signal(
         "up_date": rows[up_idx][1],
         "last_date": rows[last_idx][1],
         "last_close": f"{closes[last_idx]:.4f}",
-        "last_ma": f"{ma_values[last_idx]:.4f}",
+        "last_ma": f"{last_ma:.4f}",
+    }
+
+
+def scan_file(path: str, window: int, ma: int) -> Optional[Dict[str, str]]:
+    loaded = load_series(path)
+    if not loaded:
+        return None
+    code, stock_name, rows = loaded
+    signal = find_signal(rows, window, ma)
+    if not signal:
+        return None
+    return {
+        "code": code or os.path.splitext(os.path.basename(path))[0],
+        "name": stock_name,
+        "down_date": signal["down_date"],
+        "up_date": signal["up_date"],
+        "last_date": signal["last_date"],
+        "last_close": signal["last_close"],
+        "last_ma120": signal["last_ma"],
+        "window_days": str(window),
+        "ma_window": str(ma),
     }
 
 
+def scan_parquet(dataset_path: str, window: int, ma: int) -> List[Dict[str, str]]:
+    table = pq.read_table(dataset_path, columns=["code", "name", "date", "close"])
+    df = table.to_pandas()
+    df["close"] = pd.to_numeric(df["close"], errors="coerce")
+    date_raw = df["date"].astype(str).str.strip()
+    cleaned = date_raw.str.replace("-", "", regex=False).str.replace(
+        "/", "", regex=False
+    )
+    df["date_int"] = pd.to_numeric(
+        cleaned.where(cleaned.str.fullmatch(r"\d{8}")), errors="coerce"
+    )
+    df["date_raw"] = date_raw
+    df = df.dropna(subset=["close", "date_int"])
+
+    results: List[Dict[str, str]] = []
+    for code, group in df.groupby("code", sort=True):
+        group = group.sort_values("date_int", kind="stable")
+        rows = list(
+            zip(
+                group["date_int"].astype("int64").tolist(),
+                group["date_raw"].tolist(),
+                group["close"].tolist(),
+            )
+        )
+        signal = find_signal(rows, window, ma)
+        if not signal:
+            continue
+        name = str(group["name"].iloc[0]) if "name" in group else ""
+        results.append(
+            {
+                "code": str(code),
+                "name": name,
+                "down_date": signal["down_date"],
+                "up_date": signal["up_date"],
+                "last_date": signal["last_date"],
+                "last_close": signal["last_close"],
+                "last_ma120": signal["last_ma"],
+                "window_days": str(window),
+                "ma_window": str(ma),
+            }
+        )
+    return results
+
+
 def write_results(path: str, rows: List[Dict[str, str]]) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
     header = [
@@ -148,29 +193,26 @@ def main() -> int:
         print(f"data directory not found: {args.data_dir}", file=sys.stderr)
         return 1
 
-    for name in os.listdir(args.data_dir):
-        if not name.endswith(".csv"):
-            continue
-        path = os.path.join(args.data_dir, name)
-        loaded = load_series(path)
-        if not loaded:
-            continue
-        code, stock_name, rows = loaded
-        signal = find_signal(rows, args.window, args.ma)
-        if not signal:
-            continue
-        result = {
-            "code": code or os.path.splitext(name)[0],
-            "name": stock_name,
-            "down_date": signal["down_date"],
-            "up_date": signal["up_date"],
-            "last_date": signal["last_date"],
-            "last_close": signal["last_close"],
-            "last_ma120": signal["last_ma"],
-            "window_days": str(args.window),
-            "ma_window": str(args.ma),
-        }
-        results.append(result)
+    if args.data_dir.endswith(".parquet"):
+        if pq is None:
+            print("parquet data dir requires pyarrow", file=sys.stderr)
+            return 2
+        results = scan_parquet(args.data_dir, args.window, args.ma)
+        write_results(args.out, results)
+        print(f"matched {len(results)} symbols")
+        return 0
+
+    with os.scandir(args.data_dir) as entries:
+        paths = [
+            entry.path
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(".csv")
+        ]
+    worker = functools.partial(scan_file, window=args.window, ma=args.ma)
+    with ProcessPoolExecutor() as executor:
+        for result in executor.map(worker, paths, chunksize=8):
+            if result:
+                results.append(result)
 
     write_results(args.out, results)
     print(f"matched {len(results)} symbols")
@@ -1,155 +1,135 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import functools
+import multiprocessing
 import os
 import sys
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 
-def parse_date_int(value: str) -> Optional[int]:
-    cleaned = value.strip().replace("-", "").replace("/", "")
-    if len(cleaned) != 8 or not cleaned.isdigit():
-        return None
-    return int(cleaned)
+from kcb_common import has_min_rows, load_series_arrays
 
 
-def parse_float(value: str) -> Optional[float]:
-    try:
-        return float(value)
-    except (TypeError, ValueError):
+def load_series(
+    path: str, tail: Optional[int] = None
+) -> Optional[Tuple[str, str, np.ndarray, np.ndarray, np.ndarray]]:
+    loaded = load_series_arrays(path, tail=tail)
+    if loaded is None:
+        return None
+    code, name, date_ints, dates, closes, _ = loaded
+    valid = ~np.isnan(closes)
+    if not valid.any():
         return None
+    return code, name, date_ints[valid], dates[valid], closes[valid]
 
 
-def compute_ma(values: List[float], window: int) -> List[Optional[float]]:
-    count = len(values)
-    ma = [None] * count
-    if count < window:
-        return ma
-    window_sum = sum(values[:window])
-    ma[window - 1] = window_sum / window
-    for idx in range(window, count):
-        window_sum += values[idx] - values[idx - window]
-        ma[idx] = window_sum / window
-    return ma
-
-
-def load_series(path: str) -> Optional[Tuple[str, str, List[Tuple[int, str, float]]]]:
-    with open(path, newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        if not reader.fieldnames:
-            return None
-        fields = reader.fieldnames
-        date_field = "date" if "date" in fields else "f51" if "f51" in fields else None
-        close_field = "close" if "close" in fields else "f53" if "f53" in fields else None
-        if not date_field or not close_field:
-            return None
-
-        code = ""
-        name = ""
-        rows: List[Tuple[int, str, float]] = []
-        for row in reader:
-            date_raw = (row.get(date_field) or "").strip()
-            date_int = parse_date_int(date_raw)
-            close_val = parse_float(row.get(close_field, ""))
-            if date_int is None or close_val is None:
-                continue
-            if not code:
-                code = (row.get("code") or "").strip()
-                name = (row.get("name") or "").strip()
-            rows.append((date_int, date_raw, close_val))
-
-    if not rows:
+def load_tail(
+    path: str, need: int, min_need: int, window: int
+) -> Optional[Tuple[str, str, str, str, int, np.ndarray]]:
+    if not has_min_rows(path, min_need):
+        return None
+    loaded = load_series(path, tail=need)
+    if not loaded:
+        return None
+    code, name, _, dates, closes = loaded
+    count = closes.size
+    if count < min_need:
         return None
-    rows.sort(key=lambda item: item[0])
-    return code, name, rows
+    keep = min(count, need)
+    tail = np.zeros(need, dtype=np.float32)
+    tail[need - keep :] = closes[-keep:]
+    return (
+        code or os.path.splitext(os.path.basename(path))[0],
+        name,
+        str(dates[-window]),
+        str(dates[-1]),
+        keep,
+        tail,
+    )
 
 
-def check_ma_signal(
-    rows: List[Tuple[int, str, float]],
-    closes: List[float],
-    ma_values: List[Optional[float]],
-    window_days: int,
+def scan_batch(
+    symbols: List[Tuple[str, str, str, str, int, np.ndarray]],
+    window: int,
+    ma_list: List[int],
     band: float,
     max_outside: int,
     min_up_days: int,
     min_rise_pct: float,
-) -> Optional[Dict[str, str]]:
-    total = len(rows)
-    if total < window_days:
-        return None
-    start_idx = total - window_days
-    first_ma_idx = 0
-    for idx, value in enumerate(ma_values):
-        if value is not None:
-            first_ma_idx = idx
-            break
-    if start_idx < first_ma_idx:
-        return None
-
-    start_ma = ma_values[start_idx]
-    end_ma = ma_values[total - 1]
-    if start_ma is None or end_ma is None or start_ma <= 0:
-        return None
-
-    outside = 0
-    for idx in range(start_idx, total):
-        ma = ma_values[idx]
-        close = closes[idx]
-        if ma is None or ma <= 0:
-            return None
-        if abs(close - ma) / ma > band:
-            outside += 1
-            if outside > max_outside:
-                return None
-
-    up_days = 0
-    for idx in range(start_idx + 1, total):
-        prev = ma_values[idx - 1]
-        cur = ma_values[idx]
-        if prev is None or cur is None:
-            return None
-        if cur >= prev:
-            up_days += 1
-    if up_days < min_up_days:
-        return None
-
-    rise_pct = (end_ma - start_ma) / start_ma
-    if rise_pct < min_rise_pct:
-        return None
-
-    return {
-        "start_date": rows[start_idx][1],
-        "end_date": rows[total - 1][1],
-        "last_close": f"{closes[total - 1]:.4f}",
-        "last_ma": f"{end_ma:.4f}",
-        "up_days": str(up_days),
-        "rise_pct": f"{rise_pct:.6f}",
+) -> List[Dict[str, str]]:
+    codes, names, start_dates, end_dates, counts, tails = zip(*symbols)
+    matrix = np.stack(tails)
+    counts = np.asarray(counts, dtype=np.int64)
+    tail_close = matrix[:, -window:]
+    const_fields = {
+        "window_days": str(window),
+        "band": f"{band:.4f}",
+        "max_outside": str(max_outside),
+        "min_up_days": str(min_up_days),
+        "min_rise_pct": f"{min_rise_pct:.6f}",
     }
 
-
-def write_results(path: str, rows: List[Dict[str, str]]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    header = [
-        "code",
-        "name",
-        "ma_window",
-        "window_days",
-        "band",
-        "max_outside",
-        "min_up_days",
-        "min_rise_pct",
-        "up_days",
-        "rise_pct",
-        "start_date",
-        "end_date",
-        "last_close",
-        "last_ma",
-    ]
-    with open(path, "w", newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=header)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({key: row.get(key, "") for key in header})
+    results: List[Dict[str, str]] = []
+    taken = np.zeros(matrix.shape[0], dtype=bool)
+    for ma_window in ma_list:
+        windows = np.lib.stride_tricks.sliding_window_view(
+            matrix, ma_window, axis=1
+        )
+        ma = windows.mean(axis=-1, dtype=np.float64)
+        tail_ma = ma[:, -window:]
+        start_ma = tail_ma[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rise = (tail_ma[:, -1] - start_ma) / start_ma
+        up_days = np.count_nonzero(np.diff(tail_ma, axis=1) >= 0, axis=1)
+        outside = np.count_nonzero(
+            np.abs(tail_close - tail_ma) > band * tail_ma, axis=1
+        )
+        ok = (
+            ~taken
+            & (counts >= window + ma_window - 1)
+            & (start_ma > 0)
+            & (tail_ma > 0).all(axis=1)
+            & (rise >= min_rise_pct)
+            & (up_days >= min_up_days)
+            & (outside <= max_outside)
+        )
+        ma_fields = dict(const_fields, ma_window=str(ma_window))
+        for idx in np.flatnonzero(ok):
+            results.append(
+                {
+                    **ma_fields,
+                    "code": codes[idx],
+                    "name": names[idx],
+                    "up_days": str(int(up_days[idx])),
+                    "rise_pct": f"{rise[idx]:.6f}",
+                    "start_date": start_dates[idx],
+                    "end_date": end_dates[idx],
+                    "last_close": f"{tail_close[idx, -1]:.4f}",
+                    "last_ma": f"{tail_ma[idx, -1]:.4f}",
+                }
+            )
+        taken |= ok
+    return results
+
+
+RESULT_COLUMNS = (
+    "code",
+    "name",
+    "ma_window",
+    "window_days",
+    "band",
+    "max_outside",
+    "min_up_days",
+    "min_rise_pct",
+    "up_days",
+    "rise_pct",
+    "start_date",
+    "end_date",
+    "last_close",
+    "last_ma",
+)
 
 
 def parse_ma_list(value: str) -> List[int]:
@@ -201,51 +181,45 @@ def main() -> int:
         print(f"data directory not found: {args.data_dir}", file=sys.stderr)
         return 1
 
+    with os.scandir(args.data_dir) as entries:
+        paths = [
+            entry.path
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(".csv")
+        ]
+    need = args.window + max(ma_list) - 1
+    min_need = args.window + min(ma_list) - 1
+    worker = functools.partial(
+        load_tail, need=need, min_need=min_need, window=args.window
+    )
+    symbols = []
+    with multiprocessing.Pool() as pool:
+        for item in pool.imap_unordered(worker, paths, chunksize=32):
+            if item:
+                symbols.append(item)
+
     results: List[Dict[str, str]] = []
-    for name in os.listdir(args.data_dir):
-        if not name.endswith(".csv"):
-            continue
-        path = os.path.join(args.data_dir, name)
-        loaded = load_series(path)
-        if not loaded:
-            continue
-        code, stock_name, rows = loaded
-        closes = [row[2] for row in rows]
-
-        for ma_window in ma_list:
-            ma_values = compute_ma(closes, ma_window)
-            signal = check_ma_signal(
-                rows,
-                closes,
-                ma_values,
-                args.window,
-                args.band,
-                args.max_outside,
-                min_up_days,
-                args.min_rise_pct,
-            )
-            if not signal:
-                continue
-            result = {
-                "code": code or os.path.splitext(name)[0],
-                "name": stock_name,
-                "ma_window": str(ma_window),
-                "window_days": str(args.window),
-                "band": f"{args.band:.4f}",
-                "max_outside": str(args.max_outside),
-                "min_up_days": str(min_up_days),
-                "min_rise_pct": f"{args.min_rise_pct:.6f}",
-                "up_days": signal["up_days"],
-                "rise_pct": signal["rise_pct"],
-                "start_date": signal["start_date"],
-                "end_date": signal["end_date"],
-                "last_close": signal["last_close"],
-                "last_ma": signal["last_ma"],
-            }
-            results.append(result)
-            break
-
-    write_results(args.out, results)
+    if symbols:
+        results = scan_batch(
+            symbols,
+            args.window,
+            ma_list,
+            args.band,
+            args.max_outside,
+            min_up_days,
+            args.min_rise_pct,
+        )
+        results.sort(key=lambda row: row["code"])
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(RESULT_COLUMNS)
+        writer.writerows(
+            [result.get(column, "") for column in RESULT_COLUMNS]
+            for result in results
+        )
+
     print(f"matched {len(results)} symbols")
     return 0
 
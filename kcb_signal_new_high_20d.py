@@ -1,121 +1,106 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import functools
+import multiprocessing
 import os
 import sys
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 
-def parse_date_int(value: str) -> Optional[int]:
-    cleaned = value.strip().replace("-", "").replace("/", "")
-    if len(cleaned) != 8 or not cleaned.isdigit():
-        return None
-    return int(cleaned)
-
-
-def parse_float(value: str) -> Optional[float]:
-    try:
-        return float(value)
-    except (TypeError, ValueError):
-        return None
+from kcb_common import has_min_rows, load_series_arrays
 
 
 def load_series(
-    path: str, price_field: str
-) -> Optional[Tuple[str, str, List[Tuple[int, str, float, Optional[float], Optional[float]]]]]:
-    with open(path, newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        if not reader.fieldnames:
-            return None
-        fields = reader.fieldnames
-        date_field = "date" if "date" in fields else "f51" if "f51" in fields else None
-        high_field = "high" if "high" in fields else "f54" if "f54" in fields else None
-        close_field = "close" if "close" in fields else "f53" if "f53" in fields else None
-        if not date_field:
-            return None
-        if price_field == "high":
-            if not high_field:
-                return None
-            price_col = high_field
-        else:
-            if not close_field:
-                return None
-            price_col = close_field
-
-        code = ""
-        name = ""
-        rows: List[Tuple[int, str, float, Optional[float], Optional[float]]] = []
-        for row in reader:
-            date_raw = (row.get(date_field) or "").strip()
-            date_int = parse_date_int(date_raw)
-            price_val = parse_float(row.get(price_col, ""))
-            if date_int is None or price_val is None:
-                continue
-            if not code:
-                code = (row.get("code") or "").strip()
-                name = (row.get("name") or "").strip()
-            high_val = parse_float(row.get(high_field, "")) if high_field else None
-            close_val = parse_float(row.get(close_field, "")) if close_field else None
-            rows.append((date_int, date_raw, price_val, high_val, close_val))
-
-    if not rows:
+    path: str, price_field: str, tail: Optional[int] = None
+) -> Optional[Tuple[str, str, List[str], np.ndarray, np.ndarray, np.ndarray]]:
+    loaded = load_series_arrays(path, tail=tail)
+    if loaded is None:
+        return None
+    code, name, _, dates, closes, highs = loaded
+    price = highs if price_field == "high" else closes
+    valid = ~np.isnan(price)
+    if not valid.any():
         return None
-    rows.sort(key=lambda item: item[0])
-    return code, name, rows
+    return (
+        code,
+        name,
+        dates[valid].tolist(),
+        price[valid],
+        highs[valid],
+        closes[valid],
+    )
 
 
 def find_new_high(
-    rows: List[Tuple[int, str, float, Optional[float], Optional[float]]],
+    dates: List[str],
+    prices: np.ndarray,
+    highs: np.ndarray,
+    closes: np.ndarray,
     window_days: int,
     include_equal: bool,
 ) -> Optional[Dict[str, str]]:
-    if len(rows) < window_days or window_days < 2:
+    if prices.size < window_days or window_days < 2:
         return None
-    window_rows = rows[-window_days:]
-    prices = [row[2] for row in window_rows]
-    last_price = prices[-1]
-    prior_max = max(prices[:-1])
+    tail = prices[-window_days:]
+    last_price = float(tail[-1])
+    prior_max = float(tail[:-1].max())
     if include_equal:
         if last_price < prior_max:
             return None
     else:
         if last_price <= prior_max:
             return None
-    window_max = max(prices)
-    last_high = window_rows[-1][3]
-    last_close = window_rows[-1][4]
+    window_max = prior_max if prior_max > last_price else last_price
+    last_high = float(highs[-1])
+    last_close = float(closes[-1])
     return {
-        "window_start": window_rows[0][1],
-        "last_date": window_rows[-1][1],
+        "window_start": dates[-window_days],
+        "last_date": dates[-1],
         "last_price": f"{last_price:.4f}",
         "prior_max": f"{prior_max:.4f}",
         "window_max": f"{window_max:.4f}",
-        "last_high": f"{last_high:.4f}" if last_high is not None else "",
-        "last_close": f"{last_close:.4f}" if last_close is not None else "",
+        "last_high": f"{last_high:.4f}" if not np.isnan(last_high) else "",
+        "last_close": f"{last_close:.4f}" if not np.isnan(last_close) else "",
     }
 
 
-def write_results(path: str, rows: List[Dict[str, str]]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    header = [
-        "code",
-        "name",
-        "price_field",
-        "window_days",
-        "include_equal",
-        "window_start",
-        "last_date",
-        "last_price",
-        "prior_max",
-        "window_max",
-        "last_high",
-        "last_close",
-    ]
-    with open(path, "w", newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=header)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({key: row.get(key, "") for key in header})
+def scan_file(
+    path: str, window: int, price_field: str, include_equal: bool
+) -> Optional[Dict[str, str]]:
+    if not has_min_rows(path, window):
+        return None
+    loaded = load_series(path, price_field, tail=window)
+    if not loaded:
+        return None
+    code, stock_name, dates, price, high, close = loaded
+    signal = find_new_high(dates, price, high, close, window, include_equal)
+    if not signal:
+        return None
+    return {
+        "code": code or os.path.splitext(os.path.basename(path))[0],
+        "name": stock_name,
+        **signal,
+    }
+
+
+RESULT_COLUMNS = (
+    "code",
+    "name",
+    "price_field",
+    "window_days",
+    "include_equal",
+    "window_start",
+    "last_date",
+    "last_price",
+    "prior_max",
+    "window_max",
+    "last_high",
+    "last_close",
+)
+
+FLUSH_EVERY = 1000
 
 
 def main() -> int:
@@ -145,31 +130,41 @@ def main() -> int:
         print(f"data directory not found: {args.data_dir}", file=sys.stderr)
         return 1
 
-    results: List[Dict[str, str]] = []
-    for name in os.listdir(args.data_dir):
-        if not name.endswith(".csv"):
-            continue
-        path = os.path.join(args.data_dir, name)
-        loaded = load_series(path, args.price_field)
-        if not loaded:
-            continue
-        code, stock_name, rows = loaded
-        signal = find_new_high(rows, args.window, args.include_equal)
-        if not signal:
-            continue
-        results.append(
-            {
-                "code": code or os.path.splitext(name)[0],
-                "name": stock_name,
-                "price_field": args.price_field,
-                "window_days": str(args.window),
-                "include_equal": str(args.include_equal).lower(),
-                **signal,
-            }
-        )
-
-    write_results(args.out, results)
-    print(f"matched {len(results)} symbols")
+    with os.scandir(args.data_dir) as entries:
+        paths = [
+            entry.path
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(".csv")
+        ]
+    worker = functools.partial(
+        scan_file,
+        window=args.window,
+        price_field=args.price_field,
+        include_equal=args.include_equal,
+    )
+    const_fields = {
+        "price_field": args.price_field,
+        "window_days": str(args.window),
+        "include_equal": str(args.include_equal).lower(),
+    }
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    matched = 0
+    with open(args.out, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(RESULT_COLUMNS)
+        with multiprocessing.Pool() as pool:
+            for result in pool.imap_unordered(worker, paths, chunksize=32):
+                if not result:
+                    continue
+                row = {**const_fields, **result}
+                writer.writerow(
+                    [row.get(column, "") for column in RESULT_COLUMNS]
+                )
+                matched += 1
+                if matched % FLUSH_EVERY == 0:
+                    handle.flush()
+
+    print(f"matched {matched} symbols")
     return 0
 
 